@@ -1,19 +1,41 @@
 import os
+import re
 import wave
 import logging
 import numpy as np
+import soxr
 import json
-import urllib.request
+import mmap
+import hashlib
+import orjson
+import shutil
 import zipfile
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
 from datetime import datetime
-from flask import Flask, request, jsonify, send_file, abort
+from flask import Flask, request, jsonify, send_from_directory, abort
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.exceptions import NotFound
 from vosk import Model, KaldiRecognizer
 import firebase_admin
 from firebase_admin import credentials, db
 import requests
 import time
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue
+
+# Flask JSON responses and request bodies go through orjson
+class ORJSONProvider(DefaultJSONProvider):
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
 
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 # === Firebase setup ===
@@ -27,6 +49,8 @@ firebase_admin.initialize_app(cred, {
 
 # === AssemblyAI setup ===
 ASSEMBLYAI_API_KEY = os.environ.get("ASSEMBLYAI_API_KEY")  # store your API key as env var
+ASSEMBLYAI_TIMEOUT = 30  # seconds per HTTP call
+ASSEMBLYAI_MAX_WAIT = 10 * 60  # give up on a transcript that hasn't finished after this long
 
 # === Paths & model info ===
 base_dir = os.path.dirname(os.path.abspath(__file__))
@@ -34,73 +58,199 @@ model_dir = os.path.join(base_dir, "models")
 model_path = os.path.join(model_dir, "vosk-model-small-en-in-0.4")
 model_zip_url = "https://alphacephei.com/vosk/models/vosk-model-small-en-in-0.4.zip"
 model_zip_path = os.path.join(base_dir, "model.zip")
+model_zip_sha256 = None  # set to the archive's hex digest to pin an exact model build
+model_download_attempts = 3
 
+uploads_dir = os.path.join(base_dir, "uploads")
+transcript_cache_dir = os.path.join(base_dir, "transcript_cache")  # disposable; safe to wipe at any time
+vocab_path = os.path.join(base_dir, "vocab.json")
 raw_audio_path = os.path.join(base_dir, "recorded_audio.raw")
 wav_audio_path = os.path.join(base_dir, "audio_file.wav")
 transcription_path = os.path.join(base_dir, "transcription.txt")
 feedback_path = os.path.join(base_dir, "feedback_file.txt")
 summary_path = os.path.join(base_dir, "summary.txt")
 
-# Ensure text files exist
+CHUNK_SIZE = 64 * 1024  # bytes per read when streaming audio files
+MAX_JOBS = 4  # uploads processed concurrently
+TRANSCRIPT_CACHE_VERSION = 2  # bump whenever decoding changes so older cached transcripts are ignored
+MAX_CACHED_TRANSCRIPTS = 1000  # least recently used transcripts are pruned beyond this
+CAPTURE_RATE = 48000  # sample rate of uploaded raw PCM
+VOSK_RATE = 16000  # rate the small Vosk model is trained on
+
+# Ensure working dirs and text files exist
+os.makedirs(uploads_dir, exist_ok=True)
+os.makedirs(transcript_cache_dir, exist_ok=True)
 for path in [transcription_path, feedback_path, summary_path]:
-    if not os.path.exists(path):
-        open(path, 'w').close()
+    open(path, 'a').close()  # creates the file only if it's missing
 
 # === Download Vosk model if missing ===
 def download_model():
     if not os.path.exists(model_path):
         logging.info("Vosk model not found. Downloading...")
         os.makedirs(model_dir, exist_ok=True)
-        urllib.request.urlretrieve(model_zip_url, model_zip_path)
+        # A verified zip left by a run killed during extraction can be reused
+        if not (os.path.exists(model_zip_path) and verify_model_zip(model_zip_path)):
+            fetch_model_zip()
         logging.info("Extracting model...")
-        with zipfile.ZipFile(model_zip_path, 'r') as zip_ref:
-            zip_ref.extractall(model_dir)
+        # Extract beside the target and rename it into place, so model_path only ever appears complete
+        extract_dir = os.path.join(model_dir, ".extract-tmp")
+        shutil.rmtree(extract_dir, ignore_errors=True)
+        try:
+            shutil.unpack_archive(model_zip_path, extract_dir)
+            os.replace(os.path.join(extract_dir, os.path.basename(model_path)), model_path)
+        finally:
+            shutil.rmtree(extract_dir, ignore_errors=True)
         os.remove(model_zip_path)
         logging.info("Model ready.")
     else:
         logging.info("Vosk model already exists.")
 
+def fetch_model_zip():
+    # Download to a temp file, resuming with a Range request after a dropped connection,
+    # and only publish it once it passes verification
+    tmp_zip_path = model_zip_path + ".tmp"
+    for attempt in range(1, model_download_attempts + 1):
+        offset = os.path.getsize(tmp_zip_path) if os.path.exists(tmp_zip_path) else 0
+        headers = {'Range': f'bytes={offset}-'} if offset else {}
+        expected_size = None
+        try:
+            with requests.get(model_zip_url, headers=headers, stream=True, timeout=30) as r:
+                if r.status_code != 416:  # 416: the temp file already holds everything
+                    r.raise_for_status()
+                    resumed = r.status_code == 206
+                    length = r.headers.get('Content-Length')
+                    expected_size = ((offset if resumed else 0) + int(length)) if length else None
+                    with open(tmp_zip_path, 'ab' if resumed else 'wb') as f:
+                        # iter_content surfaces dropped connections as requests exceptions
+                        for chunk in r.iter_content(1024 * 1024):
+                            f.write(chunk)
+        except requests.RequestException as e:
+            logging.warning(f"Model download attempt {attempt} failed: {e}")
+            continue
+        if expected_size and os.path.getsize(tmp_zip_path) < expected_size:
+            logging.warning(f"Model download attempt {attempt} ended early, resuming")
+            continue
+        if verify_model_zip(tmp_zip_path):
+            os.replace(tmp_zip_path, model_zip_path)
+            return
+        logging.warning(f"Model download attempt {attempt} failed verification, starting over")
+        os.remove(tmp_zip_path)
+    raise Exception(f"Could not download Vosk model after {model_download_attempts} attempts")
+
+def verify_model_zip(path):
+    if model_zip_sha256:
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            while chunk := f.read(1024 * 1024):
+                h.update(chunk)
+        if h.hexdigest() != model_zip_sha256:
+            return False
+    try:
+        with zipfile.ZipFile(path) as zf:
+            return zf.testzip() is None  # CRC-checks every member
+    except zipfile.BadZipFile:
+        return False
+
+# Optional vocab.json (a JSON list of words/phrases) restricts Vosk to that vocabulary.
+# Decoding gets much faster and more accurate on expected words, but anything outside
+# the list is heard as [unk] and dropped from the transcript.
+def load_vosk_grammar():
+    if not os.path.exists(vocab_path):
+        return None
+    try:
+        with open(vocab_path, 'rb') as f:
+            vocab = orjson.loads(f.read())
+    except (OSError, orjson.JSONDecodeError) as e:
+        logging.error(f"Could not read {vocab_path}: {e}. Using open vocabulary.")
+        return None
+    if not isinstance(vocab, list) or not all(isinstance(w, str) for w in vocab):
+        logging.error(f"{vocab_path} must be a JSON list of strings. Using open vocabulary.")
+        return None
+    if "[unk]" not in vocab:
+        vocab.append("[unk]")
+    logging.info(f"Using restricted Vosk vocabulary of {len(vocab)} entries.")
+    return orjson.dumps(vocab).decode()
+
+VOSK_GRAMMAR = load_vosk_grammar()
+
+def new_recognizer():
+    if VOSK_GRAMMAR:
+        return KaldiRecognizer(VOSK_MODEL, VOSK_RATE, VOSK_GRAMMAR)
+    return KaldiRecognizer(VOSK_MODEL, VOSK_RATE)
+
+# Load the model once per process and keep one reusable recognizer per job worker
+download_model()
+VOSK_MODEL = Model(model_path)
+REC_POOL = Queue()
+for _ in range(MAX_JOBS):
+    REC_POOL.put(new_recognizer())
+
 # === Convert raw audio to WAV ===
-def convert_to_wav():
+def convert_to_wav(raw_path, wav_path):
+    logging.info("Converting raw audio to WAV...")
     try:
-        logging.info("Converting raw audio to WAV...")
-        with open(raw_audio_path, 'rb') as raw_file:
-            raw_data = raw_file.read()
-        audio_data = np.frombuffer(raw_data, dtype=np.int16)
-        with wave.open(wav_audio_path, 'wb') as wav_file:
+        with open(raw_path, 'rb') as raw_file, wave.open(wav_path, 'wb') as wav_file:
             wav_file.setnchannels(1)
             wav_file.setsampwidth(2)
-            wav_file.setframerate(48000)
-            wav_file.writeframes(audio_data.tobytes())
-        logging.info("WAV created.")
+            wav_file.setframerate(CAPTURE_RATE)
+            while chunk := raw_file.read(CHUNK_SIZE):
+                wav_file.writeframes(chunk)
     except Exception as e:
+        # Never leave a truncated WAV behind for callers to publish or upload
         logging.error(f"Error in WAV conversion: {e}")
+        if os.path.exists(wav_path):
+            os.remove(wav_path)
+        raise
+    logging.info("WAV created.")
 
 # === Transcribe using Vosk ===
-def transcribe_with_vosk():
-    download_model()
-    model = Model(model_path)
-    recognizer = KaldiRecognizer(model, 48000)
-    text = ""
-    with wave.open(wav_audio_path, 'rb') as wf:
-        while True:
-            data = wf.readframes(4000)
-            if not data:
-                break
-            recognizer.AcceptWaveform(data)
-    result = json.loads(recognizer.FinalResult())
-    text = result.get("text", "")
+def map_pcm(raw_path):
+    # Map the upload read-only and view it as int16 samples, so chunks are read straight from the page cache.
+    # The returned array keeps the mapping alive and it is released together with the array.
+    with open(raw_path, 'rb') as raw_file:
+        size = os.fstat(raw_file.fileno()).st_size
+        if size < 2:
+            return np.empty(0, dtype=np.int16)
+        mm = mmap.mmap(raw_file.fileno(), 0, access=mmap.ACCESS_READ)
+    return np.frombuffer(mm, dtype=np.int16, count=size // 2)
+
+def transcribe_with_vosk(raw_path):
+    recognizer = REC_POOL.get()
+    try:
+        # Raw uploads are already 16-bit mono PCM, so resample them on the way into Vosk without a WAV round-trip
+        resampler = soxr.ResampleStream(CAPTURE_RATE, VOSK_RATE, 1, dtype='int16')
+        samples = map_pcm(raw_path)
+        step = CHUNK_SIZE // 2
+        # Each completed utterance is only available from Result(); FinalResult() holds just the trailing one
+        utterances = []
+
+        def feed(chunk):
+            if recognizer.AcceptWaveform(chunk.tobytes()):
+                utterances.append(orjson.loads(recognizer.Result()).get("text", ""))
+
+        for start in range(0, len(samples), step):
+            feed(resampler.resample_chunk(samples[start:start + step]))
+        feed(resampler.resample_chunk(np.empty(0, dtype=np.int16), last=True))
+        utterances.append(orjson.loads(recognizer.FinalResult()).get("text", ""))
+    finally:
+        recognizer.Reset()
+        REC_POOL.put(recognizer)
+    text = " ".join(u for u in utterances if u)
+    if VOSK_GRAMMAR:
+        text = " ".join(w for w in text.split() if w != "[unk]")
     logging.info(f"Vosk transcription: '{text}'")
     return text
 
 # === Transcribe using AssemblyAI ===
-def transcribe_with_assemblyai():
+def transcribe_with_assemblyai(wav_path):
     logging.info("Uploading to AssemblyAI...")
-    with open(wav_audio_path, 'rb') as f:
+    with open(wav_path, 'rb') as f:
+        # The upload endpoint takes the raw bytes as the body; a generator makes requests stream it chunked
         upload_response = requests.post(
             'https://api.assemblyai.com/v2/upload',
-            headers={'authorization': ASSEMBLYAI_API_KEY},
-            files={'file': f}
+            headers={'authorization': ASSEMBLYAI_API_KEY, 'content-type': 'application/octet-stream'},
+            data=iter(lambda: f.read(CHUNK_SIZE), b''),
+            timeout=ASSEMBLYAI_TIMEOUT
         )
     upload_url = upload_response.json()['upload_url']
 
@@ -108,15 +258,19 @@ def transcribe_with_assemblyai():
     transcript_response = requests.post(
         'https://api.assemblyai.com/v2/transcript',
         json={'audio_url': upload_url},
-        headers={'authorization': ASSEMBLYAI_API_KEY}
+        headers={'authorization': ASSEMBLYAI_API_KEY},
+        timeout=ASSEMBLYAI_TIMEOUT
     )
     transcript_id = transcript_response.json()['id']
 
-    # Poll for completion
+    # Poll for completion, backing off up to 10s between checks
+    attempt = 0
+    deadline = time.monotonic() + ASSEMBLYAI_MAX_WAIT
     while True:
         polling_response = requests.get(
             f'https://api.assemblyai.com/v2/transcript/{transcript_id}',
-            headers={'authorization': ASSEMBLYAI_API_KEY}
+            headers={'authorization': ASSEMBLYAI_API_KEY},
+            timeout=ASSEMBLYAI_TIMEOUT
         )
         status = polling_response.json()['status']
         if status == 'completed':
@@ -126,79 +280,232 @@ def transcribe_with_assemblyai():
         elif status == 'failed':
             logging.error("AssemblyAI transcription failed.")
             return ""
+        elif time.monotonic() >= deadline:
+            raise Exception(f"AssemblyAI transcription {transcript_id} not finished after {ASSEMBLYAI_MAX_WAIT}s")
         else:
-            time.sleep(3)
+            time.sleep(min(10, 1.5 ** attempt))
+            attempt += 1
+
+# === Hybrid transcription, cached by audio hash ===
+def audio_cache_key(path):
+    # The decoder version and grammar change what Vosk hears, so they are part of the key
+    h = hashlib.blake2b(f"{TRANSCRIPT_CACHE_VERSION}:{VOSK_GRAMMAR or ''}".encode(), digest_size=16)
+    with open(path, 'rb') as f:
+        while chunk := f.read(CHUNK_SIZE):
+            h.update(chunk)
+    return h.hexdigest()
+
+def prune_transcript_cache():
+    # Hits refresh an entry's mtime, so the oldest mtimes are the least recently used
+    entries = []
+    with os.scandir(transcript_cache_dir) as it:
+        for entry in it:
+            if entry.name.endswith(".txt"):
+                try:
+                    entries.append((entry.stat().st_mtime, entry.path))
+                except FileNotFoundError:
+                    pass
+    entries.sort()
+    for _, path in entries[:max(len(entries) - MAX_CACHED_TRANSCRIPTS, 0)]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass  # another job pruned it first
+
+def transcribe(raw_path, wav_path):
+    cache_path = os.path.join(transcript_cache_dir, f"{audio_cache_key(raw_path)}.txt")
+    try:
+        with open(cache_path) as f:
+            text = f.read()
+        os.utime(cache_path)
+        logging.info("Identical audio seen before → using cached transcript")
+        return text
+    except FileNotFoundError:
+        pass
+
+    # Vosk first, fallback to AssemblyAI (which needs a WAV container)
+    text = transcribe_with_vosk(raw_path)
+    if len(text.split()) < 5:
+        logging.info("Vosk result too short → fallback to AssemblyAI...")
+        convert_to_wav(raw_path, wav_path)
+        text = transcribe_with_assemblyai(wav_path)
+
+    if text:
+        with atomic_open(cache_path) as f:
+            f.write(text)
+        prune_transcript_cache()
+    return text
 
 # === Analyze & push results ===
-def analyze_and_push(text):
-    # Save transcription
-    with open(transcription_path, 'w') as f:
-        f.write(text)
+# Words with edge punctuation dropped but inner . : ' kept ("u.s", "3.5", "9:30", "can't")
+_TOKEN = re.compile(r"[^\s.,!?;:\"'()\[\]{}]+(?:[.:'][^\s.,!?;:\"'()\[\]{}]+)*")
+FILLERS = frozenset({"uh", "ah", "um", "so", "because"})
 
-    words = text.split()
-    word_count = {}
-    for word in words:
-        word = word.lower().strip(".,!?;:\"'()[]{}")
-        word_count[word] = word_count.get(word, 0) + 1
+def analyze_and_push(text, session_id):
+    tokens = _TOKEN.findall(text.lower())
+    word_count = Counter(tokens)
     repetitive = {w: c for w, c in word_count.items() if c > 1}
-    filler = {w: word_count.get(w, 0) for w in {"uh", "ah", "um", "so", "because"}}
-    total = len(words)
-
-    save_feedback(repetitive, filler, total)
-    save_summary(total, filler, repetitive)
+    filler = {w: word_count[w] for w in FILLERS}  # Counter yields 0 for fillers never said
+    total = len(tokens)
 
-    now = datetime.now().strftime("%Y_%m_%d_%H%M%S")
-    session_id = f"session_{now}"
     user_id = "user_1"  # replace with real user ID
 
-    ref = db.reference(f'guidpro_results/{user_id}/{session_id}')
     pres_score = max(100 - len(repetitive) * 2, 0)
     time_score = max(100 - sum(filler.values()) * 2, 0)
     overall = (pres_score + time_score) / 2
 
-    ref.set({
-        'transcription': text,
-        'feedback': {
-            'repetitive_words': repetitive,
-            'filler_words': filler,
-            'total_word_count': total
+    # One multi-path update publishes the session and the user's latest pointer in a single round-trip
+    updates = {
+        f'guidpro_results/{user_id}/{session_id}': {
+            'transcription': text,
+            'feedback': {
+                'repetitive_words': repetitive,
+                'filler_words': filler,
+                'total_word_count': total
+            },
+            'summary': {
+                'presentation_score': pres_score,
+                'time_score': time_score,
+                'overall_score': overall
+            }
         },
-        'summary': {
-            'presentation_score': pres_score,
-            'time_score': time_score,
+        f'guidpro_latest/{user_id}': {
+            'session_id': session_id,
             'overall_score': overall
         }
-    })
+    }
+    push = IO_EXECUTOR.submit(db.reference('/').update, updates)
+
+    # Save local copies alongside the Firebase write
+    writes = [
+        IO_EXECUTOR.submit(save_transcription, text),
+        IO_EXECUTOR.submit(save_feedback, repetitive, filler, total),
+        IO_EXECUTOR.submit(save_summary, pres_score, time_score, overall)
+    ]
+
+    push.result()
     logging.info(f"Pushed results to Firebase under {user_id}/{session_id}")
+    for write in writes:
+        write.result()
+
+# === Local result files ===
+@contextmanager
+def atomic_open(path):
+    # Write to a per-thread temp file and rename, so readers never see a half-written file
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, 'w') as f:
+            yield f
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def save_transcription(text):
+    with atomic_open(transcription_path) as f:
+        f.write(text)
 
 def save_feedback(repetitive, filler, total):
     try:
-        with open(feedback_path, 'w') as f:
-            f.write("=== Feedback ===\n\nRepetitive Words:\n")
-            for w, c in repetitive.items():
-                f.write(f"{w}: {c}\n")
-            f.write("\nFiller Words:\n")
-            for w, c in filler.items():
-                f.write(f"{w}: {c}\n")
-            f.write(f"\nTotal Word Count: {total}\n")
+        content = "".join([
+            "=== Feedback ===\n\nRepetitive Words:\n",
+            *(f"{w}: {c}\n" for w, c in repetitive.items()),
+            "\nFiller Words:\n",
+            *(f"{w}: {c}\n" for w, c in filler.items()),
+            f"\nTotal Word Count: {total}\n"
+        ])
+        with atomic_open(feedback_path) as f:
+            f.write(content)
         logging.info("Feedback saved locally.")
     except Exception as e:
         logging.error(f"Error saving feedback: {e}")
 
-def save_summary(total, filler, repetitive):
+def save_summary(pres_score, time_score, overall):
     try:
-        pres_score = max(100 - len(repetitive) * 2, 0)
-        time_score = max(100 - sum(filler.values()) * 2, 0)
-        overall = (pres_score + time_score) / 2
-        with open(summary_path, 'w') as f:
-            f.write("=== Summary ===\n")
-            f.write(f"Presentation Score: {pres_score}\n")
-            f.write(f"Time Score: {time_score}\n")
-            f.write(f"Overall Score: {overall}\n")
+        content = (
+            "=== Summary ===\n"
+            f"Presentation Score: {pres_score}\n"
+            f"Time Score: {time_score}\n"
+            f"Overall Score: {overall}\n"
+        )
+        with atomic_open(summary_path) as f:
+            f.write(content)
         logging.info("Summary saved locally.")
     except Exception as e:
         logging.error(f"Error saving summary: {e}")
 
+# === Latest audio for /audio.wav ===
+audio_lock = threading.Lock()
+
+def publish_audio(raw_path, wav_path):
+    with audio_lock:
+        os.replace(raw_path, raw_audio_path)
+        if os.path.exists(wav_path):
+            os.replace(wav_path, wav_audio_path)
+        elif os.path.exists(wav_audio_path):
+            os.remove(wav_audio_path)  # stale; rebuilt from the new raw audio on demand
+
+def ensure_wav():
+    with audio_lock:
+        if os.path.exists(wav_audio_path) or not os.path.exists(raw_audio_path):
+            return
+        tmp_path = wav_audio_path + ".tmp"
+        try:
+            convert_to_wav(raw_audio_path, tmp_path)
+        except Exception:
+            return  # already logged; /audio.wav answers 404 rather than serving a broken file
+        os.replace(tmp_path, wav_audio_path)
+
+# === Background processing ===
+EXECUTOR = ThreadPoolExecutor(max_workers=MAX_JOBS)
+IO_EXECUTOR = ThreadPoolExecutor(max_workers=4)  # short I/O tasks spawned by jobs; separate pool so jobs never wait on themselves
+MAX_PENDING_JOBS = MAX_JOBS * 8  # queued + processing; /upload answers 503 beyond this
+MAX_TRACKED_JOBS = 500  # oldest finished /status entries are forgotten beyond this
+PENDING_STATUSES = ("queued", "processing")
+jobs = OrderedDict()  # session_id -> {"status": "queued" | "processing" | "done" | "error", ...}
+jobs_lock = threading.Lock()
+
+def _store_job(session_id, state):
+    # Caller holds jobs_lock. Only finished jobs are evicted; pending ones are bounded by MAX_PENDING_JOBS.
+    jobs[session_id] = state
+    jobs.move_to_end(session_id)
+    excess = len(jobs) - MAX_TRACKED_JOBS
+    if excess > 0:
+        finished = [sid for sid, job in jobs.items() if job["status"] not in PENDING_STATUSES]
+        for sid in finished[:excess]:
+            del jobs[sid]
+
+def set_job(session_id, **state):
+    with jobs_lock:
+        _store_job(session_id, state)
+
+def reserve_job(session_id):
+    with jobs_lock:
+        if sum(job["status"] in PENDING_STATUSES for job in jobs.values()) >= MAX_PENDING_JOBS:
+            return False
+        _store_job(session_id, {"status": "queued"})
+        return True
+
+def get_job(session_id):
+    with jobs_lock:
+        return jobs.get(session_id)
+
+def process_upload(raw_path, session_id):
+    set_job(session_id, status="processing")
+    wav_path = os.path.splitext(raw_path)[0] + ".wav"
+    try:
+        text = transcribe(raw_path, wav_path)
+        analyze_and_push(text, session_id)
+        publish_audio(raw_path, wav_path)
+        set_job(session_id, status="done", transcript=text)
+    except Exception as e:
+        logging.error(f"Processing error for {session_id}: {e}")
+        set_job(session_id, status="error", error=str(e))
+    finally:
+        for path in (raw_path, wav_path):
+            if os.path.exists(path):
+                os.remove(path)
+
 # === Routes ===
 @app.route('/')
 def home():
@@ -212,22 +519,34 @@ def upload_audio():
         file = request.files['file']
         if file.filename == '':
             return jsonify({"error": "No selected file"}), 400
-        file.save(raw_audio_path)
-        logging.info("Audio uploaded. Starting processing...")
-        convert_to_wav()
-
-        # Hybrid transcription: Vosk first, fallback to AssemblyAI
-        text = transcribe_with_vosk()
-        if len(text.split()) < 5:
-            logging.info("Vosk result too short → fallback to AssemblyAI...")
-            text = transcribe_with_assemblyai()
-
-        analyze_and_push(text)
-        return jsonify({"message": "Processed & uploaded to Firebase!", "transcript": text})
+
+        now = datetime.now().strftime("%Y_%m_%d_%H%M%S")
+        session_id = f"session_{now}_{uuid.uuid4().hex[:6]}"
+        if not reserve_job(session_id):
+            logging.warning(f"Rejected upload: {MAX_PENDING_JOBS} jobs already pending")
+            return jsonify({"error": "Server busy, try again later"}), 503
+        raw_path = os.path.join(uploads_dir, f"{session_id}.raw")
+        try:
+            file.save(raw_path)
+            EXECUTOR.submit(process_upload, raw_path, session_id)
+        except Exception as e:
+            set_job(session_id, status="error", error=str(e))  # release the pending slot
+            if os.path.exists(raw_path):
+                os.remove(raw_path)
+            raise
+        logging.info(f"Audio uploaded. Queued {session_id} for processing.")
+        return jsonify({"session_id": session_id, "status": "queued"}), 202
     except Exception as e:
         logging.error(f"Upload error: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/status/<session_id>')
+def job_status(session_id):
+    job = get_job(session_id)
+    if job is None:
+        return jsonify({"error": "Unknown session"}), 404
+    return jsonify({"session_id": session_id, **job})
+
 @app.route('/transcription.txt')
 def serve_transcription():
     return serve_file(transcription_path, "Transcription not found.")
@@ -242,14 +561,20 @@ def serve_summary():
 
 @app.route('/audio.wav')
 def serve_audio():
+    ensure_wav()
     return serve_file(wav_audio_path, "Audio not found.")
 
 def serve_file(path, not_found_msg):
-    if os.path.exists(path):
-        return send_file(path, as_attachment=False)
-    else:
+    try:
+        # ETag/Last-Modified let pollers get a 304 instead of the full body; Range works for the WAV
+        response = send_from_directory(base_dir, os.path.basename(path), conditional=True, etag=True)
+    except NotFound:
         abort(404, description=not_found_msg)
+    # Always revalidate: results change as soon as a job finishes, and a 304 is nearly free
+    response.headers['Cache-Control'] = 'no-cache, must-revalidate'
+    return response
 
+# Local development only; production runs under gunicorn (see gunicorn_conf.py)
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5000))
     app.run(host="0.0.0.0", port=port)
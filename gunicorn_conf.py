@@ -0,0 +1,16 @@
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+# One worker: upload jobs and their /status entries live in process memory,
+# so concurrency comes from threads rather than extra processes
+workers = 1
+worker_class = "gthread"
+threads = 8
+worker_connections = 1000
+
+# Load app.py (model download/unpack/load) in the master so a slow cold start cannot hit the worker timeout
+preload_app = True
+
+# Keep device connections open between uploads and status polls
+keepalive = 75